@@ -1,11 +1,30 @@
+import mmap
 import os
+import queue
+import shutil
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
 from PIL import Image
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 import time
 
+try:
+    import cv2
+    import numpy as np
+
+    # Images are already resized in parallel on the worker threads
+    cv2.setNumThreads(1)
+except ImportError:  # OpenCV is optional, Pillow handles resizing without it
+    cv2 = None
+
+try:
+    from turbojpeg import TJFLAG_PROGRESSIVE, TJSAMP_420, TurboJPEG
+except ImportError:  # PyTurboJPEG is optional, Pillow encodes JPEGs without it
+    TurboJPEG = None
+
 # -----------------------------------------------------------------------------
 # CUSTOMIZATION VARIABLES
 # -----------------------------------------------------------------------------
@@ -16,6 +35,9 @@ APP_WIDTH = 800  # Initial width of the application window in pixels
 APP_HEIGHT = 900  # Initial height of the application window in pixels
 APP_MIN_WIDTH = 800  # Minimum allowed width of the application window
 APP_MIN_HEIGHT = 600  # Minimum allowed height of the application window
+PROGRESS_POLL_MS = 33  # How often progress is refreshed while optimizing (ms)
+SCAN_POLL_MS = 50  # How often folder scan results are added to the list (ms)
+SCAN_BATCH_SIZE = 500  # Number of scanned files handed to the list at a time
 
 # Pastel Color Palette
 COLORS = {
@@ -72,7 +94,10 @@ TEXTS = {
     "no_files": "No files selected",
     "files_selected": "{} files selected",
     "jpg_quality": "JPEG Quality:",
+    "progressive": "Progressive JPEG",
     "png_compression": "PNG Compression:",
+    "png_fast": "Fast",
+    "webp_method": "WebP Method:",
     "resize_images": "Resize Images",
     "max_width": "Max Width:",
     "max_height": "Max Height:",
@@ -81,7 +106,6 @@ TEXTS = {
     "preserve_names": "Preserve original filenames",
     "ready": "Ready",
     "starting": "Starting optimization...",
-    "processing": "Processing {}...",
     "progress": "Processed {}/{} images. Success: {}, Failed: {}",
     "canceling": "Canceling...",
     # Dialog messages
@@ -100,7 +124,10 @@ TEXTS = {
 # Default values for settings
 DEFAULTS = {
     "jpg_quality": 85,  # Default JPEG quality (0-100)
-    "png_compression": 6,  # Default PNG compression level (0-9)
+    "progressive": True,  # Whether JPEGs are saved as progressive by default
+    "png_compression": 4,  # Default PNG compression level (0-9)
+    "png_fast_compression": 1,  # PNG compression level set by the "Fast" preset
+    "webp_method": 4,  # Default WebP encoder effort (0-6, higher is slower)
     "resize_enabled": False,  # Whether image resizing is enabled by default
     "max_width": "1920",  # Default maximum width for resizing
     "max_height": "1080",  # Default maximum height for resizing
@@ -135,6 +162,289 @@ FORMATS = {
 }
 
 
+# -----------------------------------------------------------------------------
+# IMAGE PROCESSING
+# -----------------------------------------------------------------------------
+
+
+def _iter_image_files(directory: str) -> Iterator[str]:
+    """Yield the paths of supported images in a directory tree, like os.walk"""
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.name.lower().endswith(FORMATS["file_extensions"]):
+                    if entry.is_file():
+                        yield entry.path
+    except OSError:
+        # Skip unreadable directories, as os.walk does
+        return
+
+    for subdirectory in subdirectories:
+        yield from _iter_image_files(subdirectory)
+
+
+# Files at least this large are memory-mapped instead of read through stdio
+MMAP_MIN_BYTES = 5 * 1024 * 1024
+
+# Loaded on first use, False if it is unavailable
+_turbo_jpeg = None
+_turbo_jpeg_lock = threading.Lock()
+
+
+def _get_turbo_jpeg():
+    """Return the shared libjpeg-turbo bindings, or None"""
+    global _turbo_jpeg
+    with _turbo_jpeg_lock:
+        if _turbo_jpeg is None:
+            _turbo_jpeg = False
+            if TurboJPEG is not None:
+                try:
+                    _turbo_jpeg = TurboJPEG()
+                except (OSError, RuntimeError) as e:
+                    print(f"Could not load libjpeg-turbo: {e}")
+    return _turbo_jpeg or None
+
+
+def _resize_to_fit(img: Image.Image, max_width: int, max_height: int) -> Image.Image:
+    """Downscale an image to fit within the max dimensions, keeping aspect ratio"""
+    original_width, original_height = img.size
+
+    # Only resize if the image is larger than the max dimensions
+    if original_width <= max_width and original_height <= max_height:
+        return img
+
+    # Calculate new dimensions while maintaining aspect ratio
+    width_ratio = max_width / original_width
+    height_ratio = max_height / original_height
+    ratio = min(width_ratio, height_ratio)
+
+    # Very narrow images must keep at least one pixel on each side
+    new_width = max(1, int(original_width * ratio))
+    new_height = max(1, int(original_height * ratio))
+
+    # OpenCV's area filter is much faster than Pillow's Lanczos for large
+    # downscales. Modes with alpha stay on Pillow, which premultiplies them.
+    if cv2 is not None and img.mode in ("L", "RGB"):
+        resized = cv2.resize(
+            np.asarray(img), (new_width, new_height), interpolation=cv2.INTER_AREA
+        )
+        # Keep metadata such as the ICC profile, which the writers copy from info
+        out = Image.fromarray(resized)
+        out.info = img.info.copy()
+        return out
+
+    # Pillow can't reduce() 16-bit images, which thumbnail() does for large
+    # downscales, so they take a plain Lanczos resize
+    if img.mode.startswith("I;16"):
+        return img.resize((new_width, new_height), Image.LANCZOS)
+
+    # thumbnail() keeps the aspect ratio and resizes in place. With
+    # reducing_gap it first shrinks by an integer factor, then finishes
+    # with Lanczos, which is much faster for large downscales.
+    img.thumbnail((max_width, max_height), Image.LANCZOS, reducing_gap=2.0)
+    return img
+
+
+def _build_output_path(base_name: str, settings: dict, index: int) -> str:
+    """Return the path the optimized copy of an image is saved to"""
+    file_name, original_ext = os.path.splitext(base_name)
+
+    # Adjust extension if format is changing
+    new_ext = settings["_ext_override"] or original_ext
+
+    if settings["preserve_names"]:
+        output_filename = f"{file_name}{new_ext}"
+    else:
+        # Generate a new name with the batch timestamp and the image's index,
+        # which keeps names unique within a batch
+        timestamp = settings["batch_timestamp"]
+        output_filename = f"{file_name}_optimized_{timestamp}_{index:06d}{new_ext}"
+
+    return os.path.join(settings["output_dir"], output_filename)
+
+
+def _plan_jobs(files: List[str], settings: dict) -> List[Tuple[str, str]]:
+    """Pair every image with an output path no other job reads or writes.
+
+    Images run in parallel, so two jobs must never share an output file, and
+    no job may overwrite the input of another (it could be memory-mapped).
+    Clashing names get a numbered suffix, e.g. "photo_1.jpg".
+    """
+
+    def key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    inputs = {key(file_path) for file_path in files}
+    taken = set()
+    jobs = []
+
+    for index, file_path in enumerate(files):
+        output_path = _build_output_path(os.path.basename(file_path), settings, index)
+        # Overwriting its own input is fine, the job has read it by then
+        own_input = key(file_path)
+        stem, ext = os.path.splitext(output_path)
+        suffix = 0
+        while key(output_path) in taken or (
+            key(output_path) in inputs and key(output_path) != own_input
+        ):
+            suffix += 1
+            output_path = f"{stem}_{suffix}{ext}"
+
+        taken.add(key(output_path))
+        jobs.append((file_path, output_path))
+
+    return jobs
+
+
+def _decode_image(
+    file_path: str, output_path: str, settings: dict
+) -> Optional[Tuple[Image.Image, str]]:
+    """First pipeline stage: load and resize an image.
+
+    Returns the decoded image and the format to save it as, or None when a
+    fast path has already written the output file.
+    """
+    mapped = None
+    try:
+        # Open image. Large files are memory-mapped so the kernel pages them
+        # in as the decoder reads, instead of copying through stdio buffers.
+        if os.path.getsize(file_path) >= MMAP_MIN_BYTES:
+            with open(file_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            img = Image.open(mapped)
+        else:
+            img = Image.open(file_path)
+
+        # Remember the source format; resized copies no longer carry it
+        original_format = img.format
+
+        # Copy files that need no changes instead of re-encoding them. Only
+        # the header has been read at this point, no pixels are decoded.
+        fits = not settings["resize"] or (
+            img.width <= settings["max_width"] and img.height <= settings["max_height"]
+        )
+        if (
+            fits
+            and settings["convert_format"] == "original"
+            and settings["jpg_quality"] >= 95
+            and settings["png_compression"] <= 1
+        ):
+            img.close()
+            if os.path.abspath(file_path) != os.path.abspath(output_path):
+                shutil.copyfile(file_path, output_path)
+            return None
+
+        # Re-encode JPEGs that need no resizing with libjpeg-turbo directly.
+        # It only optimizes Huffman tables for progressive output, so
+        # baseline JPEGs keep going through Pillow's optimize=True.
+        turbo_jpeg = _get_turbo_jpeg()
+        if (
+            turbo_jpeg is not None
+            and fits
+            and original_format == "JPEG"
+            and img.mode == "RGB"
+            and settings["convert_format"] in ("original", "jpg")
+            and settings["progressive"]
+        ):
+            if mapped is not None:
+                # Reuse the mapped file, then unmap it before writing; on
+                # Windows a mapped file cannot be overwritten, and the output
+                # may replace the original
+                jpeg_data = mapped[:]
+                mapped.close()
+            else:
+                with open(file_path, "rb") as f:
+                    jpeg_data = f.read()
+            img.close()
+
+            pixels = turbo_jpeg.decode(jpeg_data)
+            with open(output_path, "wb") as f:
+                f.write(
+                    turbo_jpeg.encode(
+                        pixels,
+                        quality=settings["jpg_quality"],
+                        jpeg_subsample=TJSAMP_420,
+                        flags=TJFLAG_PROGRESSIVE,
+                    )
+                )
+            return None
+
+        # Let libjpeg decode JPEGs that are about to be downscaled at a reduced
+        # scale (1/2, 1/4 or 1/8) that still covers the target size
+        if not fits and original_format == "JPEG":
+            img.draft(img.mode, (settings["max_width"], settings["max_height"]))
+
+        # Handle resize if enabled
+        if settings["resize"]:
+            img = _resize_to_fit(img, settings["max_width"], settings["max_height"])
+
+        # Determine output format
+        output_format = settings["_format_upper"] or original_format
+
+        if output_format is None:
+            # If format cannot be determined, default to PNG
+            output_format = "PNG"
+
+        # Decode the pixels here so the encode stage only has to encode. This
+        # also releases the source file, which the output may replace.
+        img.load()
+        return img, output_format
+
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def _encode_image(
+    img: Image.Image, output_format: str, output_path: str, settings: dict
+):
+    """Second pipeline stage: save a decoded image with the format's settings"""
+    # Save with appropriate settings
+    if output_format == "JPEG" or output_format == "JPG":
+        # Convert to RGB if saving as JPEG (no alpha channel support)
+        if img.mode in ("RGBA", "LA", "P"):
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+
+            # An RGBA image is its own mask: paste() reads the alpha band
+            # directly instead of splitting the image into four bands
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img)
+            img = background
+
+        img.save(
+            output_path,
+            format="JPEG",
+            quality=settings["jpg_quality"],
+            optimize=True,
+            progressive=settings["progressive"],
+        )
+
+    elif output_format == "PNG":
+        # optimize=True would force level 9 and ignore the chosen level
+        img.save(
+            output_path,
+            format="PNG",
+            compress_level=settings["png_compression"],
+        )
+
+    elif output_format == "WEBP":
+        # WebP quality goes from 0-100 like JPEG
+        img.save(
+            output_path,
+            format="WEBP",
+            quality=settings["jpg_quality"],
+            method=settings["webp_method"],
+        )
+
+    else:
+        # For other formats, just save with default settings
+        img.save(output_path, format=output_format)
+
+
 class ImageOptimizerApp:
     def __init__(self, root):
         self.root = root
@@ -147,6 +457,13 @@ class ImageOptimizerApp:
         self.output_directory = ""
         self.processing = False
         self.optimization_thread = None
+        self.decode_pool = None
+        self.encode_pool = None
+        self.total_files = 0
+        self.progress_counts = (0, 0, 0)  # Processed, successful, failed
+        self.progress_lock = threading.Lock()
+        self.scan_generation = 0  # Bumped whenever the selection is replaced
+        self.active_scans = 0
 
         # Create the main UI
         self.create_ui()
@@ -367,6 +684,12 @@ class ImageOptimizerApp:
             side=tk.LEFT, padx=PADDING["widget"]
         )
 
+        self.progressive_var = tk.BooleanVar(value=DEFAULTS["progressive"])
+        progressive_check = ttk.Checkbutton(
+            quality_frame, text=TEXTS["progressive"], variable=self.progressive_var
+        )
+        progressive_check.pack(side=tk.LEFT, padx=PADDING["widget"])
+
         # PNG compression
         png_frame = ttk.Frame(settings_frame)
         png_frame.pack(fill=tk.X, padx=PADDING["widget"], pady=PADDING["widget"])
@@ -390,6 +713,38 @@ class ImageOptimizerApp:
         ttk.Label(png_frame, textvariable=self.png_compression_var).pack(
             side=tk.LEFT, padx=PADDING["widget"]
         )
+        png_fast_btn = ttk.Button(
+            png_frame,
+            text=TEXTS["png_fast"],
+            command=lambda: self.png_compression_var.set(
+                DEFAULTS["png_fast_compression"]
+            ),
+        )
+        png_fast_btn.pack(side=tk.LEFT, padx=PADDING["widget"])
+
+        # WebP encoder method
+        webp_frame = ttk.Frame(settings_frame)
+        webp_frame.pack(fill=tk.X, padx=PADDING["widget"], pady=PADDING["widget"])
+
+        ttk.Label(webp_frame, text=TEXTS["webp_method"]).pack(
+            side=tk.LEFT, padx=PADDING["widget"]
+        )
+        self.webp_method_var = tk.IntVar(value=DEFAULTS["webp_method"])
+        webp_method_scale = ttk.Scale(
+            webp_frame,
+            from_=0,
+            to=6,
+            variable=self.webp_method_var,
+            orient=tk.HORIZONTAL,
+            length=200,
+            command=lambda val: self.webp_method_var.set(int(float(val))),
+        )
+        webp_method_scale.pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=PADDING["widget"]
+        )
+        ttk.Label(webp_frame, textvariable=self.webp_method_var).pack(
+            side=tk.LEFT, padx=PADDING["widget"]
+        )
 
         # Resize options
         resize_frame = ttk.Frame(settings_frame)
@@ -524,6 +879,7 @@ class ImageOptimizerApp:
         )
 
         if files:
+            self.cancel_scans()
             self.selected_files = list(files)
             self.update_files_list()
 
@@ -532,26 +888,102 @@ class ImageOptimizerApp:
         folder = filedialog.askdirectory(title=TEXTS["select_folder"])
 
         if folder:
-            new_files = []
+            # Scan in the background so large or network folders don't
+            # freeze the window; results are added to the list as they arrive
+            scan_queue = queue.Queue()
+            generation = self.scan_generation
+            threading.Thread(
+                target=self.scan_folder,
+                args=(folder, scan_queue, generation),
+                daemon=True,
+            ).start()
+
+            # Don't start optimizing a partial selection
+            self.active_scans += 1
+            self.update_optimize_button()
+            self.root.after(
+                SCAN_POLL_MS, self.drain_scan_queue, scan_queue, generation, 0
+            )
 
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    if file.lower().endswith(FORMATS["file_extensions"]):
-                        full_path = os.path.join(root, file)
-                        new_files.append(full_path)
+    def scan_folder(self, folder: str, scan_queue: queue.Queue, generation: int):
+        """Queue the images found under a folder in batches, ending with None"""
+        try:
+            batch = []
+            for file_path in _iter_image_files(folder):
+                if generation != self.scan_generation:  # Selection was replaced
+                    return
+
+                batch.append(file_path)
+                if len(batch) == SCAN_BATCH_SIZE:
+                    scan_queue.put(batch)
+                    batch = []
+
+            if batch:
+                scan_queue.put(batch)
+        finally:
+            scan_queue.put(None)
+
+    def drain_scan_queue(self, scan_queue: queue.Queue, generation: int, found: int):
+        """Add the batches queued by scan_folder to the files list"""
+        # Drop results of scans started before the selection was replaced
+        if generation != self.scan_generation:
+            return
+
+        done = False
+        while not done:
+            try:
+                batch = scan_queue.get_nowait()
+            except queue.Empty:
+                break
 
-            if new_files:
-                self.selected_files.extend(new_files)
-                self.update_files_list()
+            if batch is None:
+                done = True
             else:
-                messagebox.showinfo(TEXTS["no_images_title"], TEXTS["no_images_msg"])
+                found += len(batch)
+                self.selected_files.extend(batch)
+
+                # Append only the new names, in a single Tcl call
+                self.files_list.insert(
+                    tk.END, *(os.path.basename(file) for file in batch)
+                )
+
+        if found:
+            self.file_count_var.set(
+                TEXTS["files_selected"].format(len(self.selected_files))
+            )
+
+        if not done:
+            self.root.after(
+                SCAN_POLL_MS, self.drain_scan_queue, scan_queue, generation, found
+            )
+            return
+
+        self.active_scans -= 1
+        self.update_optimize_button()
+
+        if not found:
+            messagebox.showinfo(TEXTS["no_images_title"], TEXTS["no_images_msg"])
+
+    def cancel_scans(self):
+        """Stop running folder scans and discard their pending results"""
+        self.scan_generation += 1
+        self.active_scans = 0
+        self.update_optimize_button()
+
+    def update_optimize_button(self):
+        """Only allow starting when idle and no folder scan is running"""
+        if self.processing or self.active_scans:
+            self.optimize_btn.config(state=tk.DISABLED)
+        else:
+            self.optimize_btn.config(state=tk.NORMAL)
 
     def update_files_list(self):
         """Update the listbox with selected files"""
-        self.files_list.delete(0, tk.END)
+        names = [os.path.basename(file) for file in self.selected_files]
 
-        for file in self.selected_files:
-            self.files_list.insert(tk.END, os.path.basename(file))
+        # Replace the contents with one Tcl call per step, not one per file
+        self.files_list.delete(0, tk.END)
+        self.files_list.insert(tk.END, *names)
 
         self.file_count_var.set(
             TEXTS["files_selected"].format(len(self.selected_files))
@@ -559,6 +991,7 @@ class ImageOptimizerApp:
 
     def clear_selection(self):
         """Clear the selected files list"""
+        self.cancel_scans()
         self.selected_files = []
         self.files_list.delete(0, tk.END)
         self.file_count_var.set(TEXTS["no_files"])
@@ -598,7 +1031,9 @@ class ImageOptimizerApp:
         # Get optimization settings
         settings = {
             "jpg_quality": self.jpg_quality_var.get(),
+            "progressive": self.progressive_var.get(),
             "png_compression": self.png_compression_var.get(),
+            "webp_method": self.webp_method_var.get(),
             "resize": self.resize_enabled.get(),
             "max_width": (
                 int(self.max_width_var.get())
@@ -613,173 +1048,171 @@ class ImageOptimizerApp:
             "convert_format": self.convert_format_var.get(),
             "preserve_names": self.preserve_names_var.get(),
             "output_dir": output_dir,
+            "batch_timestamp": int(time.time()),
         }
 
+        # Normalize the target format once instead of once per image
+        if settings["convert_format"] != "original":
+            settings["_ext_override"] = f".{settings['convert_format'].lower()}"
+            settings["_format_upper"] = settings["convert_format"].upper()
+        else:
+            settings["_ext_override"] = None
+            settings["_format_upper"] = None
+
         # Update UI for processing state
         self.processing = True
-        self.optimize_btn.config(state=tk.DISABLED)
+        self.update_optimize_button()
         self.cancel_btn.config(state=tk.NORMAL)
         self.progress_var.set(0)
         self.status_var.set(TEXTS["starting"])
 
-        # Start optimization in a separate thread
+        # Work out every output path once, before any image is processed
+        jobs = _plan_jobs(self.selected_files, settings)
+
+        # Decoding and encoding run on separate pools, so one image can be
+        # read and resized while another is being compressed
+        workers = os.cpu_count() or 1
+        self.decode_pool = ThreadPoolExecutor(max_workers=workers)
+        self.encode_pool = ThreadPoolExecutor(max_workers=workers)
+
+        # Feed the pools from a separate thread so the UI stays responsive
+        self.total_files = len(jobs)
+        self.progress_counts = (0, 0, 0)
         self.optimization_thread = threading.Thread(
             target=self.process_images,
-            args=(self.selected_files, settings),
+            args=(jobs, settings, 2 * workers),
             daemon=True,
         )
         self.optimization_thread.start()
-
-    def process_images(self, files: List[str], settings: dict):
-        """Process all selected images with the given settings"""
-        total_files = len(files)
-        processed = 0
-        successful = 0
-        failed = 0
-
-        for i, file_path in enumerate(files):
+        self.root.after(PROGRESS_POLL_MS, self.poll_progress)
+
+    def process_images(
+        self, jobs: List[Tuple[str, str]], settings: dict, max_in_flight: int
+    ):
+        """Run every image through the decode and encode pools"""
+        # Bound the number of images in flight, so decoded images waiting for
+        # an encoder can't pile up in memory
+        slots = threading.Semaphore(max_in_flight)
+        results = []
+
+        for file_path, output_path in jobs:
+            slots.acquire()
             if not self.processing:  # Check if canceled
                 break
 
+            # Resolves to True or False once the image is done, or to None if
+            # it was canceled; either way its slot is freed
+            result = Future()
+            result.add_done_callback(lambda _: slots.release())
+            results.append(result)
+
             try:
-                self.status_var.set(
-                    TEXTS["processing"].format(os.path.basename(file_path))
+                decoded = self.decode_pool.submit(
+                    _decode_image, file_path, output_path, settings
                 )
+            except RuntimeError:  # The pool was shut down by cancel
+                result.set_result(None)
+                break
 
-                # Process the image
-                success = self.optimize_image(file_path, settings)
-
-                if success:
-                    successful += 1
-                else:
-                    failed += 1
-
-            except Exception as e:
-                failed += 1
-                print(f"Error processing {file_path}: {e}")
+            decoded.add_done_callback(
+                partial(self.on_decoded, result, file_path, output_path, settings)
+            )
 
-            processed += 1
-            progress = (processed / total_files) * 100
-            self.progress_var.set(progress)
+        wait(results)
 
-            # Update the status every few images or at the end
-            if i % 5 == 0 or i == total_files - 1:
-                self.status_var.set(
-                    TEXTS["progress"].format(processed, total_files, successful, failed)
-                )
+        # Wait for tasks that were already running when canceled
+        self.decode_pool.shutdown(wait=True)
+        self.encode_pool.shutdown(wait=True)
 
         # Reset UI after completion
+        _, successful, failed = self.progress_counts
         self.root.after(0, self.finish_optimization, successful, failed)
 
-    def optimize_image(self, file_path: str, settings: dict) -> bool:
-        """Optimize a single image according to settings"""
-        try:
-            # Open image
-            img = Image.open(file_path)
+    def on_decoded(
+        self,
+        result: Future,
+        file_path: str,
+        output_path: str,
+        settings: dict,
+        decoded: Future,
+    ):
+        """Hand a decoded image over to the encode pool"""
+        if decoded.cancelled():
+            result.set_result(None)
+            return
 
-            # Handle resize if enabled
-            if settings["resize"]:
-                original_width, original_height = img.size
-                max_width = settings["max_width"]
-                max_height = settings["max_height"]
-
-                # Only resize if the image is larger than the max dimensions
-                if original_width > max_width or original_height > max_height:
-                    # Calculate new dimensions while maintaining aspect ratio
-                    width_ratio = max_width / original_width
-                    height_ratio = max_height / original_height
-                    ratio = min(width_ratio, height_ratio)
-
-                    new_width = int(original_width * ratio)
-                    new_height = int(original_height * ratio)
-
-                    img = img.resize((new_width, new_height), Image.LANCZOS)
-
-            # Determine output format
-            original_format = img.format
-            output_format = original_format
-
-            if settings["convert_format"] != "original":
-                output_format = settings["convert_format"].upper()
-            elif output_format is None:
-                # If format cannot be determined, default to PNG
-                output_format = "PNG"
-
-            # Determine output filename
-            if settings["preserve_names"]:
-                base_name = os.path.basename(file_path)
-                file_name, original_ext = os.path.splitext(base_name)
-
-                # Adjust extension if format is changing
-                if settings["convert_format"] != "original":
-                    new_ext = f".{settings['convert_format'].lower()}"
-                else:
-                    new_ext = original_ext
-
-                output_filename = f"{file_name}{new_ext}"
-            else:
-                # Generate a new name with timestamp
-                timestamp = int(time.time())
-                file_name = os.path.basename(file_path)
-                name_without_ext, _ = os.path.splitext(file_name)
-
-                if settings["convert_format"] != "original":
-                    ext = f".{settings['convert_format'].lower()}"
-                else:
-                    _, ext = os.path.splitext(file_path)
-
-                output_filename = f"{name_without_ext}_optimized_{timestamp}{ext}"
-
-            output_path = os.path.join(settings["output_dir"], output_filename)
-
-            # Save with appropriate settings
-            if output_format == "JPEG" or output_format == "JPG":
-                # Convert to RGB if saving as JPEG (no alpha channel support)
-                if img.mode in ("RGBA", "LA", "P"):
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    background.paste(
-                        img, mask=img.split()[3] if img.mode == "RGBA" else None
-                    )
-                    img = background
+        try:
+            image_and_format = decoded.result()
+        except Exception as e:
+            self.record_result(result, file_path, e)
+            return
 
-                img.save(
-                    output_path,
-                    format="JPEG",
-                    quality=settings["jpg_quality"],
-                    optimize=True,
-                )
+        # The decode stage already wrote the file through a fast path
+        if image_and_format is None:
+            self.record_result(result, file_path)
+            return
 
-            elif output_format == "PNG":
-                img.save(
-                    output_path,
-                    format="PNG",
-                    optimize=True,
-                    compress_level=settings["png_compression"],
-                )
+        img, output_format = image_and_format
+        try:
+            encoded = self.encode_pool.submit(
+                _encode_image, img, output_format, output_path, settings
+            )
+        except RuntimeError:  # The pool was shut down by cancel
+            result.set_result(None)
+            return
 
-            elif output_format == "WEBP":
-                # WebP quality goes from 0-100 like JPEG
-                img.save(
-                    output_path,
-                    format="WEBP",
-                    quality=settings["jpg_quality"],
-                    method=6,
-                )
+        encoded.add_done_callback(partial(self.on_encoded, result, file_path))
 
+    def on_encoded(self, result: Future, file_path: str, encoded: Future):
+        """Record the outcome of an image's encode stage"""
+        if encoded.cancelled():
+            result.set_result(None)
+        else:
+            self.record_result(result, file_path, encoded.exception())
+
+    def record_result(
+        self, result: Future, file_path: str, error: Optional[BaseException] = None
+    ):
+        """Count a finished image and resolve its result future"""
+        if error is not None:
+            print(f"Error optimizing {file_path}: {error}")
+
+        # Published as one tuple so the UI never reads a partial update;
+        # poll_progress picks it up on the main thread
+        with self.progress_lock:
+            processed, successful, failed = self.progress_counts
+            if error is None:
+                successful += 1
             else:
-                # For other formats, just save with default settings
-                img.save(output_path, format=output_format)
+                failed += 1
+            self.progress_counts = (processed + 1, successful, failed)
 
-            return True
+        result.set_result(error is None)
 
-        except Exception as e:
-            print(f"Error optimizing {file_path}: {e}")
-            return False
+    def poll_progress(self):
+        """Refresh the progress display at a fixed rate while processing"""
+        if not self.processing:
+            return
+
+        self.update_progress()
+        self.root.after(PROGRESS_POLL_MS, self.poll_progress)
+
+    def update_progress(self):
+        """Show the latest counts from the collector thread"""
+        processed, successful, failed = self.progress_counts
+        if processed == 0:
+            return
+
+        self.progress_var.set((processed / self.total_files) * 100)
+        self.status_var.set(
+            TEXTS["progress"].format(processed, self.total_files, successful, failed)
+        )
 
     def finish_optimization(self, successful: int, failed: int):
         """Reset UI state after optimization completes"""
         self.processing = False
-        self.optimize_btn.config(state=tk.NORMAL)
+        self.update_progress()
+        self.update_optimize_button()
         self.cancel_btn.config(state=tk.DISABLED)
 
         if successful > 0:
@@ -799,7 +1232,9 @@ class ImageOptimizerApp:
         if self.processing:
             self.processing = False
             self.status_var.set(TEXTS["canceling"])
-            # The thread will terminate on its next iteration
+            # Drop queued tasks; images already being processed still finish
+            self.decode_pool.shutdown(wait=False, cancel_futures=True)
+            self.encode_pool.shutdown(wait=False, cancel_futures=True)
 
 
 def main():